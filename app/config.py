@@ -3,23 +3,50 @@ Configuration settings for the application
 """
 
 import os
-from typing import Optional
+from typing import List, Optional
 
 class Settings:
     """Application settings"""
     
     # Database
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./task5.db")
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./task5.db")
     
     # OpenRouter Configuration
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "openai/text-embedding-3-small")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # texts per embeddings request
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))  # max in-flight embeddings requests
     
     # Vector Database Configuration
+    VECTOR_DB_BACKEND: str = os.getenv("VECTOR_DB_BACKEND", "chroma")  # "chroma" or "hnswlib"
+    HNSWLIB_PERSIST_DIR: str = os.getenv("HNSWLIB_PERSIST_DIR", "./hnswlib_db")
+    HNSWLIB_MAX_ELEMENTS: int = int(os.getenv("HNSWLIB_MAX_ELEMENTS", "100000"))  # Initial index capacity (grows as needed)
+    HNSWLIB_SAVE_INTERVAL: float = float(os.getenv("HNSWLIB_SAVE_INTERVAL", "5.0"))  # Seconds between index saves after writes (0 = every write)
+    # Two-stage search (hnswlib backend): binary-code shortlist, then float32 rerank
+    VECTOR_QUERY_REFINE: bool = os.getenv("VECTOR_QUERY_REFINE", "false").lower() == "true"
+    VECTOR_QUERY_OVERSCAN: int = int(os.getenv("VECTOR_QUERY_OVERSCAN", "32"))  # Shortlist size = top_k * overscan
     CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+    # Connect to a shared Chroma server instead of opening CHROMA_PERSIST_DIR in-process
+    CHROMA_SERVER_HOST: str = os.getenv("CHROMA_SERVER_HOST", "")
+    CHROMA_SERVER_PORT: int = int(os.getenv("CHROMA_SERVER_PORT", "8000"))
     CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME", "documents")
+    # Write-ahead logging for the vector DB's SQLite files: commits append to a log
+    # instead of rewriting pages, so ingest doesn't stall readers or fsync every page
+    VECTOR_DB_SQLITE_WAL: bool = os.getenv("VECTOR_DB_SQLITE_WAL", "true").lower() == "true"
+    # Add (key, value) indexes to Chroma's own metadata table (ChromaDB 0.4.x only; dropped again when off)
+    CHROMA_METADATA_INDEXES: bool = os.getenv("CHROMA_METADATA_INDEXES", "false").lower() == "true"
+    # Metadata keys indexed for where filters (hnswlib backend; Chroma indexes every key)
+    INDEXED_METADATA_KEYS: List[str] = [
+        key.strip() for key in os.getenv("INDEXED_METADATA_KEYS", "document_id").split(",") if key.strip()
+    ]
+    # HNSW index parameters (used by both backends)
+    CHROMA_HNSW_CONSTRUCTION_EF: int = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "200"))
+    CHROMA_HNSW_SEARCH_EF: int = int(os.getenv("CHROMA_HNSW_SEARCH_EF", "100"))
+    CHROMA_HNSW_M: int = int(os.getenv("CHROMA_HNSW_M", "16"))
+    CHROMA_HNSW_RESIZE_FACTOR: float = float(os.getenv("CHROMA_HNSW_RESIZE_FACTOR", "2.0"))  # Index growth factor when full
+    CHROMA_HNSW_NUM_THREADS: int = int(os.getenv("CHROMA_HNSW_NUM_THREADS", str(os.cpu_count() or 1)))  # Threads for index inserts
     
     # Storage Configuration
     STORAGE_PATH: str = os.getenv("STORAGE_PATH", "./documents")
@@ -30,10 +57,24 @@ class Settings:
     
     # File Upload Limits
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB default
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1 << 20)))  # bytes read per upload chunk
+    
+    # Worker threads for blocking work (text extraction) offloaded from the event loop
+    THREADPOOL_MAX_WORKERS: int = int(os.getenv("THREADPOOL_MAX_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+    VECTOR_DB_MAX_WORKERS: int = int(os.getenv("VECTOR_DB_MAX_WORKERS", str(min(8, os.cpu_count() or 1))))  # Threads for vector DB calls
     
     # Query Configuration
     DEFAULT_TOP_K: int = int(os.getenv("DEFAULT_TOP_K", "5"))  # Default number of chunks to retrieve
     MAX_TOP_K: int = int(os.getenv("MAX_TOP_K", "10"))  # Maximum chunks to retrieve
+    QUERY_BATCH_SIZE: int = int(os.getenv("QUERY_BATCH_SIZE", "32"))  # Max concurrent queries per vector DB call
+    QUERY_BATCH_WAIT_MS: float = float(os.getenv("QUERY_BATCH_WAIT_MS", "5"))  # How long to wait to fill a batch
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # Cached answers (0 disables)
+    QUERY_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("QUERY_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+    CHROMA_ADD_BATCH_SIZE: int = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "512"))  # Chunks per collection.add() call
+    VECTOR_QUERY_CACHE_SIZE: int = int(os.getenv("VECTOR_QUERY_CACHE_SIZE", "1024"))  # Cached vector searches (0 disables)
+    VECTOR_QUERY_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("VECTOR_QUERY_CACHE_SIMILARITY_THRESHOLD", "0.98"))
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))  # Cached question embeddings
+    QUERY_EMBEDDING_CACHE_TTL: int = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))  # seconds
 
     @classmethod
     def init_directories(cls):
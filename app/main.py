@@ -2,23 +2,44 @@
 Main FastAPI application
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from app.config import settings
 from app.database import init_db
 from app.routes import documents, query, health
+from app.services.http_client import close_openrouter_client
+from app.services.vector_db_service import vector_db_service
 
 # Initialize directories
 settings.init_directories()
 
-# Initialize database
-init_db()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown"""
+    # Size the pool used by asyncio.to_thread for blocking work
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.THREADPOOL_MAX_WORKERS)
+    )
+    await init_db()
+    yield
+    if vector_db_service:
+        vector_db_service.close()
+    await close_openrouter_client()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="RAG Document Search API",
     version="1.0.0",
-    description="AI-Powered Document Search & RAG Query Service with Vector Database"
+    description="AI-Powered Document Search & RAG Query Service with Vector Database",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -30,6 +51,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (document text and chunks compress well)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(documents.router)
@@ -45,7 +69,7 @@ async def root():
         "docs": "/docs",
         "health": "/health",
         "supported_formats": ["PDF", "DOCX", "TXT"],
-        "vector_db": "ChromaDB",
+        "vector_db": "hnswlib" if settings.VECTOR_DB_BACKEND == "hnswlib" else "ChromaDB",
         "embedding_model": settings.EMBEDDING_MODEL,
         "llm_model": settings.LLM_MODEL,
     }
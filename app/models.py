@@ -2,11 +2,18 @@
 Database models
 """
 
+from datetime import datetime, timezone
 from sqlalchemy import Column, String, Integer, DateTime, Text, JSON
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.database import Base
 
 
+def _utcnow() -> datetime:
+    """Naive UTC timestamp with microseconds (stored in the same format cursors are bound in)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Document(Base):
     """Document model for storing document metadata"""
     __tablename__ = "documents"
@@ -16,10 +23,11 @@ class Document(Base):
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # pdf, docx, txt
-    extracted_text = Column(Text, nullable=True)
+    extracted_text = deferred(Column(Text, nullable=True))  # Large; only loaded when requested
     chunk_count = Column(Integer, default=0, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending, processing, completed, failed
     document_metadata = Column(JSON, nullable=True)  # Renamed from 'metadata' (reserved word)
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, default=_utcnow, server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     
     def __repr__(self):
@@ -2,9 +2,13 @@
 Document routes for uploading and managing documents
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+import os
+import uuid
+from datetime import datetime
+import aiofiles
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status, Query, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db
 from app.schemas import (
     DocumentUploadResponse,
@@ -18,20 +22,23 @@ from app.config import settings
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 
-@router.post("", response_model=DocumentUploadResponse, status_code=201)
+@router.post("", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Upload a document (PDF, DOCX, or TXT)
     
+    Saves the file and returns immediately; in the background it:
     - Extracts text from the document
     - Chunks the text
     - Generates embeddings
     - Stores in vector database
     
-    Returns document ID and chunk count
+    Returns document ID and status; poll GET /documents/{document_id} until
+    status is "completed" (or "failed")
     """
     # Validate file type
     if not file.content_type:
@@ -48,28 +55,59 @@ async def upload_document(
             detail="Only PDF, DOCX, and TXT files are supported"
         )
     
-    # Read file content
-    file_content = await file.read()
+    # Fail fast instead of accepting a document that can never be indexed
+    if not settings.OPENROUTER_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="OPENROUTER_API_KEY is not set. Please set it in your environment variables."
+        )
+    
+    # Stream file to disk, validating size as we go
+    document_id = str(uuid.uuid4())
+    file_path = document_service.get_file_path(document_id, file_type)
+    total_size = 0
+    
+    try:
+        async with aiofiles.open(file_path, "wb") as out:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                total_size += len(chunk)
+                if total_size > settings.MAX_FILE_SIZE:
+                    break
+                await out.write(chunk)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     
     # Validate file size
-    if len(file_content) > settings.MAX_FILE_SIZE:
+    if total_size > settings.MAX_FILE_SIZE:
+        os.remove(file_path)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File size exceeds {settings.MAX_FILE_SIZE / 1024 / 1024}MB limit"
         )
     
     try:
-        doc = await document_service.create_document(
-            db=db,
-            filename=file.filename or "document",
-            file_content=file_content,
-            file_type=file_type
-        )
+        try:
+            doc = await document_service.create_document(
+                db=db,
+                document_id=document_id,
+                filename=file.filename or "document",
+                file_path=file_path,
+                file_type=file_type
+            )
+        except Exception:
+            # Without a document row nothing will ever process or delete the saved file
+            os.remove(file_path)
+            raise
+        
+        background_tasks.add_task(document_service.process_document, doc.document_id)
         
         return DocumentUploadResponse(
             document_id=doc.document_id,
-            message="Document uploaded and indexed successfully",
+            message="Document uploaded; indexing in progress",
             chunk_count=doc.chunk_count,
+            status=doc.status,
         )
     
     except ValueError as e:
@@ -101,33 +139,27 @@ async def upload_document(
 async def list_documents(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[datetime] = Query(None, description="Return documents created before this time"),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    List all uploaded documents with chunk counts
+    List all uploaded documents with chunk counts, newest first
+    
+    Pass the created_at of the last document as `cursor` to fetch the next page
     """
-    docs = document_service.list_documents(db, skip=skip, limit=limit)
-    return [
-        DocumentInfo(
-            document_id=doc.document_id,
-            original_filename=doc.original_filename,
-            file_type=doc.file_type,
-            chunk_count=doc.chunk_count,
-            created_at=doc.created_at,
-        )
-        for doc in docs
-    ]
+    docs = await document_service.list_documents(db, skip=skip, limit=limit, cursor=cursor)
+    return [DocumentInfo(**row._mapping) for row in docs]
 
 
 @router.get("/{document_id}", response_model=DocumentDetail)
 async def get_document(
     document_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get document details including extracted text and chunks
     """
-    doc = document_service.get_document(db, document_id)
+    doc = await document_service.get_document(db, document_id)
     
     if not doc:
         raise HTTPException(
@@ -139,8 +171,7 @@ async def get_document(
     chunks_data = []
     if vector_db_service:
         try:
-            chunk_ids = [f"{document_id}_chunk_{i}" for i in range(doc.chunk_count)]
-            results = vector_db_service.get_chunks(chunk_ids)
+            results = await vector_db_service.aget_chunks_by_document(document_id)
             
             chunks_data = [
                 {"chunk_id": chunk_id, "text": doc_text}
@@ -155,6 +186,8 @@ async def get_document(
         file_type=doc.file_type,
         extracted_text=doc.extracted_text or "",
         chunk_count=doc.chunk_count,
+        status=doc.status,
+        error=(doc.document_metadata or {}).get("error"),
         chunks=chunks_data,
         created_at=doc.created_at,
     )
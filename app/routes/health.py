@@ -15,7 +15,7 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         message="RAG Document Search API is running",
-        vector_db="ChromaDB",
+        vector_db="hnswlib" if settings.VECTOR_DB_BACKEND == "hnswlib" else "ChromaDB",
         embedding_model=settings.EMBEDDING_MODEL,
         llm_model=settings.LLM_MODEL,
     )
@@ -2,13 +2,15 @@
 Query routes for RAG-based document search
 """
 
+import numpy as np
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas import QueryRequest, QueryResponse, ChunkInfo
 from app.services.embedding_service import embedding_service
 from app.services.rag_service import rag_service
 from app.services.vector_db_service import vector_db_service
+from app.services.query_cache_service import query_cache_service
 from app.config import settings
 
 router = APIRouter(prefix="/query", tags=["Query"])
@@ -17,7 +19,7 @@ router = APIRouter(prefix="/query", tags=["Query"])
 @router.post("", response_model=QueryResponse)
 async def query_documents(
     query_data: QueryRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Query documents using RAG
@@ -39,11 +41,25 @@ async def query_documents(
         # Validate top_k
         top_k = min(max(query_data.top_k, 1), settings.MAX_TOP_K)
         
+        # Serve repeated questions from the cache
+        cache_key = (query_cache_service.normalize_question(query_data.question), top_k)
+        cached_response = query_cache_service.get(cache_key)
+        if cached_response:
+            return cached_response
+        
+        # A document indexed while this request runs clears the cache; don't store a stale answer after that
+        cache_generation = query_cache_service.generation
+        
         # Embed question
-        question_embedding = await embedding_service.get_embedding(query_data.question)
+        question_embedding = await embedding_service.get_query_embedding(query_data.question)
+        
+        # Serve near-identical questions from the cache
+        cached_response = query_cache_service.get_similar(question_embedding, scope=top_k)
+        if cached_response:
+            return cached_response
         
         # Search vector database
-        results = vector_db_service.query(
+        results = await vector_db_service.aquery(
             query_embedding=question_embedding,
             n_results=top_k
         )
@@ -62,30 +78,39 @@ async def query_documents(
         metadatas = results["metadatas"][0]
         distances = results.get("distances", [[0.0] * len(chunk_ids)])[0]
         
-        # Calculate similarity scores (1 - distance for cosine similarity)
-        similarity_scores = [1 - dist for dist in distances]
+        # Calculate similarity scores (ip distance is 1 - cosine similarity for unit vectors)
+        similarity_scores = (1.0 - np.asarray(distances, dtype=np.float64)).round(4).tolist()
         
         chunks_used = [
             ChunkInfo(
                 chunk_id=chunk_id,
                 text=chunk_text,
-                similarity_score=round(score, 4),
+                similarity_score=score,
             )
             for chunk_id, chunk_text, score in zip(chunk_ids, chunks_text, similarity_scores)
         ]
         
-        # Get unique document IDs
-        document_ids = list(set([meta["document_id"] for meta in metadatas]))
+        # Get unique document IDs, keeping the best-ranked document first
+        document_ids = list(dict.fromkeys(meta["document_id"] for meta in metadatas))
         
         # Generate answer using RAG
         answer_data = await rag_service.generate_answer(query_data.question, chunks_text)
         
-        return QueryResponse(
+        response = QueryResponse(
             answer=answer_data["answer"],
             chunks_used=chunks_used,
             document_ids=document_ids,
             model=answer_data["model"],
         )
+        query_cache_service.put(
+            cache_key,
+            question_embedding,
+            scope=top_k,
+            value=response,
+            generation=cache_generation,
+        )
+        
+        return response
     
     except Exception as e:
         raise HTTPException(
@@ -12,6 +12,7 @@ class DocumentUploadResponse(BaseModel):
     document_id: str
     message: str
     chunk_count: int
+    status: str
     
     class Config:
         from_attributes = True
@@ -44,6 +45,7 @@ class DocumentInfo(BaseModel):
     original_filename: str
     file_type: str
     chunk_count: int
+    status: str
     created_at: datetime
     
     class Config:
@@ -63,6 +65,8 @@ class DocumentDetail(BaseModel):
     file_type: str
     extracted_text: str
     chunk_count: int
+    status: str
+    error: Optional[str] = None
     chunks: List[ChunkDetail]
     created_at: datetime
     
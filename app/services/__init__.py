@@ -8,6 +8,7 @@ from app.services.rag_service import rag_service
 from app.services.text_extraction_service import text_extraction_service
 from app.services.chunking_service import chunking_service
 from app.services.vector_db_service import vector_db_service
+from app.services.query_cache_service import query_cache_service
 
 __all__ = [
     "document_service",
@@ -16,5 +17,6 @@ __all__ = [
     "text_extraction_service",
     "chunking_service",
     "vector_db_service",
+    "query_cache_service",
 ]
 
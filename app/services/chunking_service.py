@@ -2,6 +2,7 @@
 Text chunking service for splitting documents into chunks
 """
 
+import numpy as np
 from typing import List
 from app.config import settings
 
@@ -28,30 +29,36 @@ class ChunkingService:
             overlap = settings.CHUNK_OVERLAP
         
         words = text.split()
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        if not words:
+            return []
         
-        for word in words:
-            # Approximate tokens: ~4 characters per token
-            word_length = len(word) // 4
-            
-            if current_length + word_length > chunk_size and current_chunk:
-                # Save current chunk
-                chunks.append(" ".join(current_chunk))
-                
-                # Start new chunk with overlap
-                overlap_words = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
-                current_chunk = overlap_words + [word]
-                current_length = sum(len(w) // 4 for w in current_chunk)
-            else:
-                current_chunk.append(word)
-                current_length += word_length
+        # Approximate tokens: ~4 characters per token
+        lengths = np.fromiter((len(w) >> 2 for w in words), dtype=np.int64, count=len(words))
+        cumulative = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=cumulative[1:])
+        
+        # Scan for (start, end) word ranges first, then build every chunk string in one pass
+        boundaries = []
+        start = 0
+        end = 0
         
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+        while True:
+            # First word that would push the chunk past chunk_size; the word
+            # that closed the previous chunk always opens the next one
+            limit = int(np.searchsorted(cumulative, cumulative[start] + chunk_size, side="right"))
+            end = max(limit - 1, end + 1)
+            
+            if end >= len(words):
+                boundaries.append((start, len(words)))
+                break
+            
+            boundaries.append((start, end))
+            
+            # Start new chunk with overlap
+            if end - start > overlap:
+                start = end - overlap
         
-        return chunks
+        return [" ".join(words[s:e]) for s, e in boundaries]
 
 
 chunking_service = ChunkingService()
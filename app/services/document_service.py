@@ -2,59 +2,124 @@
 Document service for managing document uploads and processing
 """
 
-import uuid
+import asyncio
 import os
 from datetime import datetime
-from typing import List, Dict
-from sqlalchemy.orm import Session
+from typing import List, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from app.database import SessionLocal
 from app.models import Document
 from app.config import settings
 from app.services.text_extraction_service import text_extraction_service
 from app.services.chunking_service import chunking_service
 from app.services.embedding_service import embedding_service
 from app.services.vector_db_service import vector_db_service
+from app.services.query_cache_service import query_cache_service
 
 
 class DocumentService:
     """Service for managing documents"""
     
+    @staticmethod
+    def get_file_extension(file_type: str) -> str:
+        """Determine the stored file extension from a MIME type"""
+        if "pdf" in file_type.lower():
+            return "pdf"
+        elif "wordprocessingml" in file_type.lower() or "docx" in file_type.lower():
+            return "docx"
+        return "txt"
+    
+    @staticmethod
+    def get_file_path(document_id: str, file_type: str) -> str:
+        """Build the storage path for a document"""
+        file_ext = DocumentService.get_file_extension(file_type)
+        return os.path.join(settings.STORAGE_PATH, f"{document_id}.{file_ext}")
+    
     @staticmethod
     async def create_document(
-        db: Session,
+        db: AsyncSession,
+        document_id: str,
         filename: str,
-        file_content: bytes,
+        file_path: str,
         file_type: str
     ) -> Document:
         """
-        Create a new document, extract text, chunk it, generate embeddings, and store in vector DB
+        Create a pending document record for an uploaded file
+        
+        The file is indexed afterwards by process_document.
         
         Args:
             db: Database session
+            document_id: Document identifier
             filename: Original filename
-            file_content: File content as bytes
+            file_path: Path the uploaded file was saved to
             file_type: File MIME type
-            
+        
         Returns:
             Created Document instance
         """
-        # Generate document ID
-        document_id = str(uuid.uuid4())
+        doc = Document(
+            document_id=document_id,
+            original_filename=filename,
+            file_path=file_path,
+            file_type=DocumentService.get_file_extension(file_type),
+            status="pending",
+        )
+        db.add(doc)
+        await db.commit()
+        await db.refresh(doc)
         
-        # Determine file extension
-        if "pdf" in file_type.lower():
-            file_ext = "pdf"
-        elif "wordprocessingml" in file_type.lower() or "docx" in file_type.lower():
-            file_ext = "docx"
-        else:
-            file_ext = "txt"
+        return doc
+    
+    @staticmethod
+    async def process_document(document_id: str):
+        """
+        Extract text, chunk it, generate embeddings, and store in vector DB
         
-        # Save file
-        file_path = os.path.join(settings.STORAGE_PATH, f"{document_id}.{file_ext}")
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        Runs after the upload response has been sent, with its own database session.
+        The document ends up "completed", or "failed" with the error in its metadata.
         
-        # Extract text
-        extracted_text = text_extraction_service.extract_text(file_content, file_type)
+        Args:
+            document_id: Document identifier
+        """
+        async with SessionLocal() as db:
+            doc = await DocumentService.get_document(db, document_id)
+            if not doc:
+                return
+            
+            doc.status = "processing"
+            await db.commit()
+            
+            try:
+                extracted_text, chunk_count = await DocumentService._index_document(doc)
+            except Exception as e:
+                doc.status = "failed"
+                doc.document_metadata = {"error": str(e)}
+                # Remove any chunks already added; a failure here must not leave the document "processing"
+                if vector_db_service:
+                    try:
+                        await vector_db_service.adelete_document(document_id)
+                    except Exception as cleanup_error:
+                        doc.document_metadata["cleanup_error"] = str(cleanup_error)
+                await db.commit()
+            else:
+                doc.extracted_text = extracted_text
+                doc.chunk_count = chunk_count
+                doc.status = "completed"
+                await db.commit()
+            finally:
+                # Cached answers may no longer reflect the indexed documents, including
+                # answers built from a failed document's chunks while it was processing
+                query_cache_service.clear()
+    
+    @staticmethod
+    async def _index_document(doc: Document):
+        """Run the indexing pipeline for a document, returning (extracted_text, chunk_count)"""
+        # Extract text off the event loop. PDF/DOCX parsing is pure Python and still
+        # holds the GIL, but other requests keep being served while it runs.
+        extracted_text = await asyncio.to_thread(text_extraction_service.extract_text, doc.file_path, doc.file_type)
         
         if not extracted_text.strip():
             raise ValueError("No text extracted from document")
@@ -65,54 +130,77 @@ class DocumentService:
         if not chunks:
             raise ValueError("No chunks created from document")
         
-        # Generate embeddings for chunks
-        embeddings = await embedding_service.get_embeddings_batch(chunks)
+        # Generate embeddings for chunks in the background while the rest is prepared
+        embed_task = asyncio.create_task(embedding_service.get_embeddings_batch(chunks))
         
         # Prepare data for vector DB
-        chunk_ids = [f"{document_id}_chunk_{i}" for i in range(len(chunks))]
+        chunk_ids = [f"{doc.document_id}_chunk_{i}" for i in range(len(chunks))]
         metadatas = [
             {
-                "document_id": document_id,
+                "document_id": doc.document_id,
                 "chunk_index": i,
-                "filename": filename,
+                "filename": doc.original_filename,
             }
             for i in range(len(chunks))
         ]
         
+        embeddings = await embed_task
+        
         # Store in vector database
         if vector_db_service:
-            vector_db_service.add_documents(
-                document_id=document_id,
+            await vector_db_service.aadd_documents(
+                document_id=doc.document_id,
                 chunk_ids=chunk_ids,
                 embeddings=embeddings,
                 chunks=chunks,
                 metadatas=metadatas
             )
         
-        # Create database record
-        doc = Document(
-            document_id=document_id,
-            original_filename=filename,
-            file_path=file_path,
-            file_type=file_ext,
-            extracted_text=extracted_text,
-            chunk_count=len(chunks),
-        )
-        db.add(doc)
-        db.commit()
-        db.refresh(doc)
-        
-        return doc
+        return extracted_text, len(chunks)
     
     @staticmethod
-    def get_document(db: Session, document_id: str) -> Document:
-        """Get document by ID"""
-        return db.query(Document).filter(Document.document_id == document_id).first()
+    async def get_document(db: AsyncSession, document_id: str) -> Document:
+        """Get document by ID, including its extracted text"""
+        stmt = (
+            select(Document)
+            .options(undefer(Document.extracted_text))
+            .filter_by(document_id=document_id)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().first()
     
     @staticmethod
-    def list_documents(db: Session, skip: int = 0, limit: int = 100):
-        """List documents with pagination"""
-        return db.query(Document).offset(skip).limit(limit).all()
+    async def list_documents(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[datetime] = None
+    ):
+        """
+        List documents, newest first (summary columns only)
+        
+        Args:
+            db: Database session
+            skip: Number of documents to skip (offset pagination)
+            limit: Maximum number of documents to return
+            cursor: Only return documents created before this time (keyset pagination)
+        
+        Returns:
+            Rows with document_id, original_filename, file_type, chunk_count, status, created_at
+        """
+        stmt = select(
+            Document.document_id,
+            Document.original_filename,
+            Document.file_type,
+            Document.chunk_count,
+            Document.status,
+            Document.created_at,
+        )
+        if cursor is not None:
+            stmt = stmt.where(Document.created_at < cursor)
+        stmt = stmt.order_by(Document.created_at.desc()).offset(skip).limit(limit)
+        result = await db.execute(stmt)
+        return result.all()
     
     @staticmethod
     async def get_document_chunks(document_id: str) -> List[Dict[str, str]]:
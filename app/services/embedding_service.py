@@ -2,16 +2,28 @@
 Embedding service for generating vector embeddings using OpenRouter
 """
 
-import httpx
-from typing import List
+import asyncio
+import time
+import numpy as np
+import orjson
+from collections import OrderedDict
+from typing import List, Tuple
 from app.config import settings
+from app.services.http_client import post_json
+from app.services.query_cache_service import QueryCacheService
+
+# Caps concurrent embeddings requests across all uploads
+_batch_semaphore = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+
+# Normalized question -> (expiry time, embedding), least recently used first
+_query_embedding_cache: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
 
 
 class EmbeddingService:
     """Service for generating embeddings"""
     
     @staticmethod
-    async def get_embedding(text: str) -> List[float]:
+    async def get_embedding(text: str) -> np.ndarray:
         """
         Get embedding for a single text
         
@@ -19,70 +31,120 @@ class EmbeddingService:
             text: Text to embed
             
         Returns:
-            Embedding vector as list of floats
+            Unit-normalized embedding vector (float32 array)
         """
         if not settings.OPENROUTER_API_KEY:
             raise ValueError("OPENROUTER_API_KEY is not set. Please set it in your environment variables.")
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/embeddings",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": settings.EMBEDDING_MODEL,
-                    "input": text,
-                },
-            )
-            
-            if response.status_code == 401:
-                error_data = response.json() if response.text else {}
-                error_msg = error_data.get("error", {}).get("message", "Authentication failed")
-                raise ValueError(f"OpenRouter API authentication failed: {error_msg}. Please check your OPENROUTER_API_KEY.")
-            elif response.status_code != 200:
-                raise Exception(f"Embedding API error (status {response.status_code}): {response.text}")
+        response = await post_json(
+            "/embeddings",
+            {
+                "model": settings.EMBEDDING_MODEL,
+                "input": text,
+            },
+            timeout=30.0,
+        )
+        
+        if response.status_code == 401:
+            error_data = orjson.loads(response.content) if response.content else {}
+            error_msg = error_data.get("error", {}).get("message", "Authentication failed")
+            raise ValueError(f"OpenRouter API authentication failed: {error_msg}. Please check your OPENROUTER_API_KEY.")
+        elif response.status_code != 200:
+            raise Exception(f"Embedding API error (status {response.status_code}): {response.text}")
+        
+        result = orjson.loads(response.content)
+        embedding = np.asarray(result["data"][0]["embedding"], dtype=np.float32)
+        return EmbeddingService._normalize(embedding[np.newaxis, :])[0]
+    
+    @staticmethod
+    async def get_query_embedding(question: str) -> np.ndarray:
+        """
+        Get embedding for a user question, reusing it for repeats of the same question
+        
+        Args:
+            question: Question to embed
             
-            result = response.json()
-            return result["data"][0]["embedding"]
+        Returns:
+            Unit-normalized embedding vector (float32 array)
+        """
+        key = QueryCacheService.normalize_question(question)
+        now = time.monotonic()
+        
+        cached = _query_embedding_cache.get(key)
+        if cached and cached[0] > now:
+            _query_embedding_cache.move_to_end(key)
+            return cached[1]
+        
+        embedding = await EmbeddingService.get_embedding(question)
+        
+        if settings.QUERY_EMBEDDING_CACHE_SIZE > 0:
+            _query_embedding_cache[key] = (now + settings.QUERY_EMBEDDING_CACHE_TTL, embedding)
+            _query_embedding_cache.move_to_end(key)
+            while len(_query_embedding_cache) > settings.QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embedding_cache.popitem(last=False)
+        
+        return embedding
     
     @staticmethod
-    async def get_embeddings_batch(texts: List[str]) -> List[List[float]]:
+    async def get_embeddings_batch(texts: List[str]) -> np.ndarray:
         """
         Get embeddings for multiple texts in batch
         
+        Texts are split into EMBEDDING_BATCH_SIZE requests that run concurrently
+        (at most EMBEDDING_CONCURRENCY at a time).
+        
         Args:
             texts: List of texts to embed
             
         Returns:
-            List of embedding vectors
+            Unit-normalized embeddings as a float32 array of shape (len(texts), dim),
+            in the same order as texts
         """
         if not settings.OPENROUTER_API_KEY:
             raise ValueError("OPENROUTER_API_KEY is not set. Please set it in your environment variables.")
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/embeddings",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*(EmbeddingService._embed_batch(batch) for batch in batches))
+        
+        embeddings = results[0] if len(results) == 1 else np.concatenate(results)
+        return EmbeddingService._normalize(embeddings)
+    
+    @staticmethod
+    async def _embed_batch(texts: List[str]) -> np.ndarray:
+        """Embed a single batch of texts with one API request"""
+        async with _batch_semaphore:
+            response = await post_json(
+                "/embeddings",
+                {
                     "model": settings.EMBEDDING_MODEL,
                     "input": texts,
                 },
+                timeout=60.0,
             )
             
             if response.status_code == 401:
-                error_data = response.json() if response.text else {}
+                error_data = orjson.loads(response.content) if response.content else {}
                 error_msg = error_data.get("error", {}).get("message", "Authentication failed")
                 raise ValueError(f"OpenRouter API authentication failed: {error_msg}. Please check your OPENROUTER_API_KEY.")
             elif response.status_code != 200:
                 raise Exception(f"Embedding API error (status {response.status_code}): {response.text}")
             
-            result = response.json()
-            return [item["embedding"] for item in result["data"]]
+            result = orjson.loads(response.content)
+            data = sorted(result["data"], key=lambda item: item["index"])
+            
+            embeddings = np.empty((len(data), len(data[0]["embedding"])), dtype=np.float32)
+            for i, item in enumerate(data):
+                embeddings[i] = item["embedding"]
+            return embeddings
+    
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Scale each row to unit length in place"""
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings /= norms
+        return embeddings
 
 
 embedding_service = EmbeddingService()
@@ -0,0 +1,647 @@
+"""
+Direct hnswlib vector index with a SQLite side table for chunk text and metadata
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import orjson
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Number of set bits in each 16-bit value, for Hamming distances between packed codes
+_POPCOUNT_8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+_POPCOUNT_16 = _POPCOUNT_8[np.arange(65536) & 0xFF] + _POPCOUNT_8[np.arange(65536) >> 8]
+
+
+class HnswlibBackend:
+    """
+    Vector index exposing the subset of the Chroma collection API used by VectorDBService
+    
+    Vectors live in an hnswlib index (inner-product space, so callers pass unit vectors).
+    Each vector's integer label keys a SQLite row holding the chunk id, text, and metadata.
+    Results have the same shape as Chroma's: one inner list per query embedding.
+    """
+    
+    def __init__(
+        self,
+        persist_dir: str,
+        max_elements: int,
+        ef_construction: int = 200,
+        ef_search: int = 100,
+        M: int = 16,
+        num_threads: int = -1,
+        indexed_metadata_keys: Sequence[str] = ("document_id",),
+        binary_codes: bool = False,
+        wal: bool = True,
+        save_interval: float = 5.0
+    ):
+        if not HNSWLIB_AVAILABLE:
+            raise Exception("hnswlib is not installed")
+        
+        os.makedirs(persist_dir, exist_ok=True)
+        self.index_path = os.path.join(persist_dir, "index.bin")
+        self.max_elements = max_elements
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.M = M
+        self.num_threads = num_threads
+        self.index = None
+        # Packed sign bits and float32 copies per label for query_refined(),
+        # kept only when binary_codes is set
+        self.binary_codes = binary_codes
+        self.codes_path = os.path.join(persist_dir, "binary_codes.npz")
+        self.vectors_path = os.path.join(persist_dir, "vectors.f32")
+        self._codes: Optional[np.ndarray] = None  # (labels, code bytes) uint8, padded to 16-bit words
+        self._live: Optional[np.ndarray] = None  # labels that are currently stored
+        self._vectors: Optional[np.memmap] = None  # (labels, dim) float32, memory-mapped
+        # hnswlib must not be resized while it is searched, and the connection is shared
+        self._lock = threading.Lock()
+        # Saving rewrites the whole index, so writes only schedule a save at most
+        # save_interval seconds later (0 saves after every write); close() saves the rest
+        self.save_interval = save_interval
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        
+        self._db = sqlite3.connect(
+            os.path.join(persist_dir, "chunks.sqlite3"),
+            check_same_thread=False,
+        )
+        if wal:
+            # Commits append to the log; with WAL, NORMAL only syncs at checkpoints
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                label INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS index_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        # Expression indexes match the json_extract() calls built by _where_clause
+        for key in indexed_metadata_keys:
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS chunks_metadata_{self._index_suffix(key)} "
+                f"ON chunks ({self._metadata_expression(key)})"
+            )
+        self._db.commit()
+        
+        # Keep capacity from earlier resize_index() calls across restarts
+        capacity = self._db.execute("SELECT value FROM index_info WHERE key = 'max_elements'").fetchone()
+        if capacity:
+            self.max_elements = max(self.max_elements, int(capacity[0]))
+        
+        dim = self._db.execute("SELECT value FROM index_info WHERE key = 'dim'").fetchone()
+        if dim and os.path.exists(self.index_path):
+            self._open_index(int(dim[0]))
+        else:
+            self._reconcile()
+    
+    def add(
+        self,
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Add (or overwrite) vectors with their chunk ids, texts, and metadata"""
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        
+        with self._lock:
+            if self.index is None:
+                self._create_index(vectors.shape[1])
+            
+            # Overwritten chunk ids get a fresh label too: add_items(replace_deleted=True) may
+            # put the new vector in a freed slot and leave the old one live under the same label
+            stale = list(self._labels_for_ids(ids).values())
+            for label in stale:
+                self.index.mark_deleted(label)
+            if stale and self._live is not None:
+                self._live[stale] = False
+            next_label = self._next_label()
+            labels = list(range(next_label, next_label + len(ids)))
+            next_label += len(ids)
+            self._db.execute(
+                "INSERT OR REPLACE INTO index_info (key, value) VALUES ('next_label', ?)",
+                (str(next_label),),
+            )
+            
+            needed = self.index.get_current_count() + len(ids)
+            if needed > self.index.get_max_elements():
+                # Not pre-allocated for this many vectors; double rather than growing per batch
+                self._resize(max(needed, 2 * self.index.get_max_elements()))
+            
+            self.index.add_items(vectors, np.asarray(labels, dtype=np.int64), replace_deleted=True)
+            if self.binary_codes:
+                self._set_codes(np.asarray(labels, dtype=np.int64), vectors)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (label, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (label, chunk_id, document, orjson.dumps(metadata).decode())
+                    for label, chunk_id, document, metadata in zip(labels, ids, documents, metadatas)
+                ],
+            )
+            self._db.commit()
+            self._mark_dirty()
+    
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances")
+    ) -> Dict[str, Any]:
+        """Find the nearest chunks for each query embedding, optionally filtered by metadata"""
+        vectors = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        
+        with self._lock:
+            if self.index is None:
+                return self._empty_query_result(len(vectors), include)
+            
+            allowed = None
+            if where:
+                allowed = set(self._labels_matching(where))
+                available = len(allowed)
+            else:
+                available = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            
+            k = min(n_results, available)
+            if k == 0:
+                return self._empty_query_result(len(vectors), include)
+            
+            try:
+                labels, distances = self.index.knn_query(
+                    vectors, k=k, filter=allowed.__contains__ if allowed is not None else None
+                )
+            except RuntimeError:
+                # The graph search found fewer than k matches (very selective filter); search exactly
+                labels, distances = self._exact_query(vectors, k, allowed)
+            
+            return self._query_result(labels, distances, include)
+    
+    def query_refined(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+        overscan: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Two-stage search: shortlist by Hamming distance on sign bits, then rerank with float32
+        
+        Stage 1 scans the packed sign-bit codes (dim / 8 bytes per vector, 32x smaller
+        than float32) and keeps the n_results * overscan closest. Stage 2 computes exact
+        inner products for that shortlist from the memory-mapped float32 vectors.
+        Requires binary_codes=True. Same arguments and result shape as query().
+        """
+        vectors = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        
+        with self._lock:
+            if self.index is None:
+                return self._empty_query_result(len(vectors), include)
+            if self._codes is None:
+                raise Exception("Binary codes are not enabled for this index")
+            
+            if where:
+                candidates = np.asarray(self._labels_matching(where), dtype=np.int64)
+                codes = self._codes[candidates]
+                available = len(candidates)
+            else:
+                # Scan every slot in place; deleted ones are pushed to the end below
+                candidates = np.arange(len(self._live))
+                codes = self._codes
+                available = int(self._live.sum())
+            
+            k = min(n_results, available)
+            if k == 0:
+                return self._empty_query_result(len(vectors), include)
+            shortlist_size = min(k * max(overscan, 1), available)
+            
+            words = codes.view(np.uint16)
+            query_words = self._pack_codes(vectors).view(np.uint16)
+            labels = np.empty((len(vectors), k), dtype=np.int64)
+            distances = np.empty((len(vectors), k), dtype=np.float32)
+            for q in range(len(vectors)):
+                hamming = _POPCOUNT_16[words ^ query_words[q]].sum(axis=1, dtype=np.uint32)
+                if not where:
+                    hamming[~self._live] = np.iinfo(np.uint32).max
+                if shortlist_size < len(candidates):
+                    shortlist = candidates[np.argpartition(hamming, shortlist_size - 1)[:shortlist_size]]
+                else:
+                    shortlist = candidates
+                shortlist_distances = 1.0 - self._vectors[shortlist] @ vectors[q]
+                top = np.argsort(shortlist_distances)[:k]
+                labels[q] = shortlist[top]
+                distances[q] = shortlist_distances[top]
+            
+            return self._query_result(labels, distances, include)
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents")
+    ) -> Dict[str, Any]:
+        """Get chunks by id and/or metadata filter"""
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"chunk_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if where:
+            clause, where_params = self._where_clause(where)
+            clauses.append(clause)
+            params.extend(where_params)
+        
+        sql = "SELECT label, chunk_id, document, metadata FROM chunks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY label"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            embeddings = None
+            if "embeddings" in include:
+                embeddings = self._embeddings_for_labels(np.asarray([[row[0] for row in rows]]))[0] if rows else []
+        
+        result = {
+            "ids": [row[1] for row in rows],
+            "documents": [row[2] for row in rows],
+            "metadatas": [orjson.loads(row[3]) for row in rows],
+            "embeddings": embeddings,
+        }
+        return self._apply_include(result, include)
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Delete chunks by id and/or metadata filter"""
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"chunk_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if where:
+            clause, where_params = self._where_clause(where)
+            clauses.append(clause)
+            params.extend(where_params)
+        if not clauses:
+            return
+        
+        condition = " AND ".join(clauses)
+        with self._lock:
+            labels = [row[0] for row in self._db.execute(f"SELECT label FROM chunks WHERE {condition}", params)]
+            if not labels:
+                return
+            
+            # Deleted slots are reused by later adds (replace_deleted=True)
+            for label in labels:
+                self.index.mark_deleted(label)
+            if self._live is not None:
+                self._live[labels] = False
+            self._db.execute(f"DELETE FROM chunks WHERE {condition}", params)
+            self._db.commit()
+            self._mark_dirty()
+    
+    def resize_index(self, new_capacity: int):
+        """
+        Grow the index to hold new_capacity vectors
+        
+        Holds the index lock while hnswlib copies the graph, so searches wait for it to finish.
+        
+        Args:
+            new_capacity: Number of vectors the index can hold
+        """
+        with self._lock:
+            if self.index is None:
+                # Nothing to copy yet; the capacity applies when the index is created
+                self.max_elements = max(self.max_elements, new_capacity)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO index_info (key, value) VALUES ('max_elements', ?)",
+                    (str(self.max_elements),),
+                )
+                self._db.commit()
+            elif new_capacity > self.index.get_max_elements():
+                self._resize(new_capacity)
+    
+    def flush(self):
+        """Write pending index changes to disk"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._save()
+    
+    def close(self):
+        """Save pending index changes and close the chunk table"""
+        self.flush()
+        with self._lock:
+            self._db.close()
+    
+    def count(self) -> int:
+        """Number of stored chunks"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def _next_label(self) -> int:
+        """
+        First label never handed out before
+        
+        Deleted labels stay in hnswlib's label map (marked deleted) until add_items()
+        replaces their slot, so reusing one would remap a different slot onto it.
+        The counter in index_info only grows; older stores without it start past
+        every label in SQLite and in the index.
+        """
+        stored = self._db.execute("SELECT value FROM index_info WHERE key = 'next_label'").fetchone()
+        if stored:
+            return int(stored[0])
+        next_label = self._db.execute("SELECT COALESCE(MAX(label), -1) + 1 FROM chunks").fetchone()[0]
+        if self.index is not None and self.index.get_current_count():
+            next_label = max(next_label, max(self.index.get_ids_list()) + 1)
+        return next_label
+    
+    def _create_index(self, dim: int):
+        """Create an empty index for vectors of the given dimension"""
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(
+            max_elements=self.max_elements,
+            ef_construction=self.ef_construction,
+            M=self.M,
+            allow_replace_deleted=True,
+        )
+        self.index.set_ef(self.ef_search)
+        self.index.set_num_threads(self.num_threads)
+        self._db.execute("INSERT OR REPLACE INTO index_info (key, value) VALUES ('dim', ?)", (str(dim),))
+        if self.binary_codes:
+            self._reset_codes(dim)
+    
+    def _resize(self, new_capacity: int):
+        """Resize the index and record its capacity (caller holds the lock)"""
+        self.index.resize_index(new_capacity)
+        self.max_elements = new_capacity
+        self._db.execute("INSERT OR REPLACE INTO index_info (key, value) VALUES ('max_elements', ?)", (str(new_capacity),))
+        self._db.commit()
+        self._mark_dirty()
+    
+    def _open_index(self, dim: int):
+        """Load the persisted index"""
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.load_index(self.index_path, max_elements=self.max_elements, allow_replace_deleted=True)
+        self.index.set_ef(self.ef_search)
+        self.index.set_num_threads(self.num_threads)
+        self._reconcile()
+        if self.binary_codes:
+            self._load_codes(dim)
+    
+    def _reconcile(self):
+        """
+        Make the chunk table and the loaded index agree after an unclean shutdown
+        
+        Chunk rows are committed on every write but the index is saved later, so the
+        index may lack the last adds (their rows are dropped, since the vectors are lost)
+        or still hold the last deletes (they are marked deleted again).
+        """
+        indexed = set(self.index.get_ids_list()) if self.index is not None else set()
+        stored = {row[0] for row in self._db.execute("SELECT label FROM chunks")}
+        
+        lost = stored - indexed
+        if lost:
+            logger.warning("Dropping %d chunks whose vectors were not saved before shutdown", len(lost))
+            self._db.executemany("DELETE FROM chunks WHERE label = ?", [(label,) for label in lost])
+            self._db.commit()
+        
+        for label in indexed - stored:
+            try:
+                self.index.mark_deleted(label)
+            except RuntimeError:
+                pass  # Deleted before the last save
+    
+    def _mark_dirty(self):
+        """Schedule a save of the index after a write (caller holds the lock)"""
+        self._dirty = True
+        if self.save_interval <= 0:
+            self._save()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _save(self):
+        """Persist the index (and binary codes) to disk (caller holds the lock)"""
+        # Write a temporary file and rename it over the old one, so an interrupted
+        # save leaves the previous copy intact
+        self.index.save_index(self.index_path + ".tmp")
+        os.replace(self.index_path + ".tmp", self.index_path)
+        if self._codes is not None:
+            self._vectors.flush()
+            with open(self.codes_path + ".tmp", "wb") as f:
+                np.savez(f, codes=self._codes, live=self._live)
+            os.replace(self.codes_path + ".tmp", self.codes_path)
+        self._dirty = False
+    
+    @staticmethod
+    def _pack_codes(vectors: np.ndarray) -> np.ndarray:
+        """Pack sign bits of each row, padded to a whole number of 16-bit words"""
+        codes = np.packbits(vectors > 0, axis=1)
+        if codes.shape[1] % 2:
+            codes = np.pad(codes, ((0, 0), (0, 1)))
+        return codes
+    
+    def _reset_codes(self, dim: int, capacity: int = 1024):
+        """Start empty code and vector arrays for vectors of the given dimension"""
+        code_bytes = (dim + 15) // 16 * 2
+        self._codes = np.zeros((capacity, code_bytes), dtype=np.uint8)
+        self._live = np.zeros(capacity, dtype=bool)
+        with open(self.vectors_path, "wb") as f:
+            f.truncate(capacity * dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+    
+    def _set_codes(self, labels: np.ndarray, vectors: np.ndarray):
+        """Store codes and float32 copies for the given labels, growing the arrays as needed"""
+        size = int(labels.max()) + 1
+        if size > len(self._live):
+            capacity = max(size, 2 * len(self._live))
+            codes = np.zeros((capacity, self._codes.shape[1]), dtype=np.uint8)
+            codes[:len(self._codes)] = self._codes
+            live = np.zeros(capacity, dtype=bool)
+            live[:len(self._live)] = self._live
+            self._codes, self._live = codes, live
+            
+            dim = self._vectors.shape[1]
+            self._vectors.flush()
+            self._vectors = None
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(capacity * dim * 4)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        
+        self._codes[labels] = self._pack_codes(vectors)
+        self._vectors[labels] = vectors
+        self._live[labels] = True
+    
+    def _load_codes(self, dim: int):
+        """Load persisted codes and vectors, rebuilding them from the index if missing or stale"""
+        labels = [row[0] for row in self._db.execute("SELECT label FROM chunks ORDER BY label")]
+        
+        if os.path.exists(self.codes_path) and os.path.exists(self.vectors_path):
+            saved = np.load(self.codes_path)
+            codes, live = saved["codes"], saved["live"]
+            # Labels are never reused, so the codes are current exactly when they cover the
+            # stored labels (they go stale if the index was written with binary codes off)
+            if (
+                codes.shape[1] == (dim + 15) // 16 * 2
+                and (not labels or len(live) > labels[-1])
+                and np.array_equal(np.flatnonzero(live), labels)
+                and os.path.getsize(self.vectors_path) == len(live) * dim * 4
+            ):
+                self._codes, self._live = codes, live
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(len(live), dim))
+                return
+        
+        self._reset_codes(dim)
+        for start in range(0, len(labels), 10000):
+            batch = np.asarray(labels[start:start + 10000], dtype=np.int64)
+            self._set_codes(batch, np.asarray(self.index.get_items(batch), dtype=np.float32))
+        self._mark_dirty()
+    
+    def _exact_query(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        allowed: Optional[set]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force inner-product search over the allowed labels (all stored chunks if None)"""
+        if allowed is None:
+            # Not get_ids_list(): it still lists labels marked deleted, which get_items() rejects
+            candidates = np.asarray(
+                [row[0] for row in self._db.execute("SELECT label FROM chunks")], dtype=np.int64
+            )
+        else:
+            candidates = np.fromiter(allowed, dtype=np.int64, count=len(allowed))
+        stored = np.asarray(self.index.get_items(candidates), dtype=np.float32)
+        distances = 1.0 - vectors @ stored.T
+        nearest = np.argsort(distances, axis=1)[:, :k]
+        return candidates[nearest], np.take_along_axis(distances, nearest, axis=1)
+    
+    def _labels_matching(self, where: Dict[str, Any]) -> List[int]:
+        """Labels of chunks whose metadata matches a where filter"""
+        clause, params = self._where_clause(where)
+        return [row[0] for row in self._db.execute(f"SELECT label FROM chunks WHERE {clause}", params)]
+    
+    def _query_result(self, labels: np.ndarray, distances: np.ndarray, include: Sequence[str]) -> Dict[str, Any]:
+        """Build a Chroma-shaped query result from per-query labels and distances"""
+        rows = self._rows_for_labels(np.unique(labels).tolist())
+        embeddings = self._embeddings_for_labels(labels) if "embeddings" in include else None
+        
+        result: Dict[str, Any] = {key: [] for key in ("ids", "documents", "metadatas", "distances", "embeddings")}
+        for q in range(len(labels)):
+            # Labels whose SQLite row is missing (e.g. an interrupted write) are skipped
+            hits = [(i, rows[label]) for i, label in enumerate(labels[q].tolist()) if label in rows]
+            result["ids"].append([row[0] for _, row in hits])
+            result["documents"].append([row[1] for _, row in hits])
+            result["metadatas"].append([row[2] for _, row in hits])
+            result["distances"].append([float(distances[q][i]) for i, _ in hits])
+            if embeddings is not None:
+                result["embeddings"].append([embeddings[q][i] for i, _ in hits])
+        
+        return self._apply_include(result, include)
+    
+    def _labels_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        """Map chunk ids that are already stored to their labels"""
+        if not ids:
+            return {}
+        rows = self._db.execute(
+            f"SELECT chunk_id, label FROM chunks WHERE chunk_id IN ({','.join('?' * len(ids))})",
+            ids,
+        )
+        return dict(rows.fetchall())
+    
+    def _rows_for_labels(self, labels: List[int]) -> Dict[int, Tuple[str, str, Dict[str, Any]]]:
+        """Fetch (chunk_id, document, metadata) for each label"""
+        if not labels:
+            return {}
+        rows = self._db.execute(
+            f"SELECT label, chunk_id, document, metadata FROM chunks WHERE label IN ({','.join('?' * len(labels))})",
+            labels,
+        )
+        return {label: (chunk_id, document, orjson.loads(metadata)) for label, chunk_id, document, metadata in rows}
+    
+    def _embeddings_for_labels(self, labels: np.ndarray) -> List[List[List[float]]]:
+        """Stored vectors for a 2-D array of labels, as nested lists"""
+        flat = np.asarray(self.index.get_items(labels.reshape(-1)), dtype=np.float32)
+        return flat.reshape(labels.shape + (-1,)).tolist()
+    
+    @staticmethod
+    def _where_clause(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """
+        Translate a Chroma-style metadata filter to SQL
+        
+        Supports {"key": value}, {"key": {"$eq": value}}, and "$and" lists of those.
+        """
+        clauses, params = [], []
+        for key, value in where.items():
+            if key == "$and":
+                for condition in value:
+                    clause, condition_params = HnswlibBackend._where_clause(condition)
+                    clauses.append(clause)
+                    params.extend(condition_params)
+                continue
+            
+            if isinstance(value, dict):
+                if set(value) != {"$eq"}:
+                    raise ValueError(f"Unsupported filter operator for '{key}': {value}")
+                value = value["$eq"]
+            # The path is inlined (not bound) so SQLite can use the expression indexes
+            clauses.append(f"{HnswlibBackend._metadata_expression(key)} = ?")
+            params.append(value)
+        
+        return " AND ".join(clauses) or "1", params
+    
+    @staticmethod
+    def _metadata_expression(key: str) -> str:
+        """SQL expression reading a top-level metadata key"""
+        if '"' in key or "'" in key:
+            raise ValueError(f"Unsupported metadata key: {key}")
+        return f"json_extract(metadata, '$.\"{key}\"')"
+    
+    @staticmethod
+    def _index_suffix(key: str) -> str:
+        """Identifier-safe form of a metadata key for index names"""
+        return "".join(ch if ch.isalnum() else "_" for ch in key)
+    
+    @staticmethod
+    def _empty_query_result(n_queries: int, include: Sequence[str]) -> Dict[str, Any]:
+        """Query result with no matches for each query"""
+        result = {key: [[] for _ in range(n_queries)] for key in ("ids", "documents", "metadatas", "distances", "embeddings")}
+        return HnswlibBackend._apply_include(result, include)
+    
+    @staticmethod
+    def _apply_include(result: Dict[str, Any], include: Sequence[str]) -> Dict[str, Any]:
+        """Set fields that weren't requested to None, as Chroma does"""
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key in result and key not in include:
+                result[key] = None
+        return result
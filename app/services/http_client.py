@@ -0,0 +1,30 @@
+"""
+Shared HTTP client for OpenRouter API calls
+"""
+
+import httpx
+import orjson
+from app.config import settings
+
+# Reused across requests so TCP/TLS connections are pooled and multiplexed over HTTP/2
+openrouter_client = httpx.AsyncClient(
+    base_url=settings.OPENROUTER_BASE_URL,
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    headers={
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip, br",
+    },
+)
+
+
+async def post_json(path: str, payload: dict, **kwargs) -> httpx.Response:
+    """POST a JSON payload serialized with orjson (much faster than stdlib json for embeddings)"""
+    return await openrouter_client.post(path, content=orjson.dumps(payload), **kwargs)
+
+
+async def close_openrouter_client():
+    """Close the shared client and its pooled connections"""
+    await openrouter_client.aclose()
@@ -0,0 +1,148 @@
+"""
+Query cache service for reusing results of repeated or near-identical queries
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+from app.config import settings
+
+
+class QueryCacheService:
+    """LRU cache of query results, looked up by exact key or by embedding similarity"""
+    
+    def __init__(self, max_size: int, similarity_threshold: float):
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Hashable, int]" = OrderedDict()  # key -> slot, least recent first
+        self._slot_keys: List[Optional[Hashable]] = [None] * max_size
+        self._slot_values: List[Any] = [None] * max_size
+        self._slot_scopes = np.full(max_size, -1, dtype=np.int32)
+        self._scope_ids: Dict[Hashable, int] = {}
+        # Embeddings are stored as int8 codes with a per-entry scale (4x smaller than float32)
+        self._codes: Optional[np.ndarray] = None  # (max_size, dim), allocated on first insert
+        self._scales = np.zeros(max_size, dtype=np.float32)
+        # Bumped by clear(); results computed before a clear must not be stored after it
+        self.generation = 0
+    
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Normalize a question for exact-match lookups"""
+        return " ".join(question.lower().split())
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached result by exact key
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached result, or None on a miss
+        """
+        slot = self._entries.get(key)
+        if slot is None:
+            return None
+        
+        self._entries.move_to_end(key)
+        return self._slot_values[slot]
+    
+    def get_similar(self, embedding: List[float], scope: Hashable) -> Optional[Any]:
+        """
+        Get the cached result whose embedding is most similar to the given one
+        
+        Args:
+            embedding: Query embedding
+            scope: Only entries stored with the same scope (e.g. top_k) can match
+        
+        Returns:
+            Cached result if the best cosine similarity reaches the threshold, else None
+        """
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None or self._codes is None:
+            return None
+        
+        query = self._unit_vector(embedding)
+        if query.shape[0] != self._codes.shape[1]:
+            return None
+        
+        scores = (self._codes @ query) * self._scales
+        scores[self._slot_scopes != scope_id] = -np.inf
+        
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.similarity_threshold:
+            return None
+        
+        self._entries.move_to_end(self._slot_keys[slot])
+        return self._slot_values[slot]
+    
+    def put(
+        self,
+        key: Hashable,
+        embedding: List[float],
+        scope: Hashable,
+        value: Any,
+        generation: Optional[int] = None
+    ):
+        """
+        Store a result, evicting the least recently used entry when full
+        
+        Args:
+            key: Cache key for exact lookups
+            embedding: Query embedding for similarity lookups
+            scope: Scope the result is valid for (e.g. top_k)
+            value: Result to cache
+            generation: Value of `generation` read before computing the result;
+                the result is dropped if the cache was cleared since
+        """
+        if self.max_size <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        
+        vector = self._unit_vector(embedding)
+        if self._codes is None or self._codes.shape[1] != vector.shape[0]:
+            self.clear()
+            self._codes = np.zeros((self.max_size, vector.shape[0]), dtype=np.int8)
+        
+        if key in self._entries:
+            slot = self._entries[key]
+            self._entries.move_to_end(key)
+        elif len(self._entries) < self.max_size:
+            slot = len(self._entries)
+            self._entries[key] = slot
+        else:
+            _, slot = self._entries.popitem(last=False)
+            self._entries[key] = slot
+        
+        scale = max(float(np.abs(vector).max()), 1e-6) / 127
+        self._codes[slot] = np.round(vector / scale).astype(np.int8)
+        self._scales[slot] = scale
+        self._slot_scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        self._slot_keys[slot] = key
+        self._slot_values[slot] = value
+    
+    def clear(self):
+        """Remove all cached results"""
+        self.generation += 1
+        self._entries.clear()
+        self._slot_keys = [None] * self.max_size
+        self._slot_values = [None] * self.max_size
+        self._slot_scopes.fill(-1)
+        self._scope_ids.clear()
+    
+    @staticmethod
+    def _unit_vector(embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        squared_norm = float(np.dot(vector, vector))
+        # Callers usually pass normalized embeddings; skip the division for those
+        if squared_norm == 0 or abs(squared_norm - 1.0) < 1e-4:
+            return vector
+        return vector / np.sqrt(squared_norm)
+
+
+query_cache_service = QueryCacheService(
+    max_size=settings.QUERY_CACHE_SIZE,
+    similarity_threshold=settings.QUERY_CACHE_SIMILARITY_THRESHOLD,
+)
@@ -2,32 +2,19 @@
 Text extraction service for PDF, DOCX, and TXT files
 """
 
-from io import BytesIO
 from typing import Optional
 
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
 
 class TextExtractionService:
     """Service for extracting text from documents"""
     
     @staticmethod
-    def extract_text(file_content: bytes, file_type: str) -> str:
+    def extract_text(file_path: str, file_type: str) -> str:
         """
         Extract text from document based on file type
         
         Args:
-            file_content: File content as bytes
+            file_path: Path to the stored file
             file_type: MIME type or file extension
             
         Returns:
@@ -36,34 +23,69 @@ class TextExtractionService:
         file_type_lower = file_type.lower()
         
         if "pdf" in file_type_lower:
-            return TextExtractionService._extract_from_pdf(file_content)
+            return TextExtractionService._extract_from_pdf(file_path)
         elif "wordprocessingml" in file_type_lower or "docx" in file_type_lower:
-            return TextExtractionService._extract_from_docx(file_content)
+            return TextExtractionService._extract_from_docx(file_path)
         elif "text/plain" in file_type_lower or file_type_lower == "txt":
-            return file_content.decode("utf-8")
+            with open(file_path, "r", encoding="utf-8") as f:
+                return f.read()
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     
     @staticmethod
-    def _extract_from_pdf(file_content: bytes) -> str:
-        """Extract text from PDF file"""
-        if not PDF_AVAILABLE:
-            raise Exception("PyPDF2 not installed. Install with: pip install PyPDF2")
+    def _extract_from_pdf(file_path: str) -> str:
+        """Extract text from PDF file, preferring PDFium and falling back to PyPDF2"""
+        # Parsers are imported on first use to keep them off the startup path
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            pdfium = None
+        
+        pdfium_error = None
+        if pdfium is not None:
+            try:
+                return TextExtractionService._extract_from_pdf_pdfium(pdfium, file_path)
+            except Exception as e:
+                pdfium_error = e
         
-        pdf_file = BytesIO(file_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        try:
+            import PyPDF2
+        except ImportError:
+            if pdfium_error is not None:
+                raise pdfium_error
+            raise Exception("No PDF library installed. Install with: pip install pypdfium2")
+        
+        pdf_reader = PyPDF2.PdfReader(file_path)
         text = ""
         for page in pdf_reader.pages:
             text += page.extract_text() + "\n"
         return text.strip()
     
     @staticmethod
-    def _extract_from_docx(file_content: bytes) -> str:
+    def _extract_from_pdf_pdfium(pdfium, file_path: str) -> str:
+        """Extract text from PDF file with PDFium (native, much faster than PyPDF2)"""
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            pages_text = []
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                pages_text.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return "\n".join(pages_text).strip()
+        finally:
+            pdf.close()
+    
+    @staticmethod
+    def _extract_from_docx(file_path: str) -> str:
         """Extract text from DOCX file"""
-        if not DOCX_AVAILABLE:
+        try:
+            from docx import Document
+        except ImportError:
             raise Exception("python-docx not installed. Install with: pip install python-docx")
         
-        doc = Document(BytesIO(file_content))
+        doc = Document(file_path)
         text = ""
         for paragraph in doc.paragraphs:
             text += paragraph.text + "\n"
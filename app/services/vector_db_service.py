@@ -2,8 +2,19 @@
 Vector database service for storing and querying document embeddings
 """
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
 from app.config import settings
+from app.services.query_cache_service import QueryCacheService
+from app.services.hnswlib_backend import HnswlibBackend
 
 try:
     import chromadb
@@ -12,6 +23,117 @@ try:
 except ImportError:
     CHROMADB_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# One client per persist directory (or server), shared by every VectorDBService in the process
+_CLIENT_CACHE: Dict[str, Any] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+# Indexes added to Chroma's embedding_metadata table by _tune_sqlite, with their columns
+_CHROMA_METADATA_INDEXES = {
+    "embedding_metadata_key_string_value": ("key", "string_value"),
+    "embedding_metadata_key_int_value": ("key", "int_value"),
+}
+
+# HNSW settings that don't affect the stored index, so a different value needs no rebuild
+_HNSW_RUNTIME_KEYS = {"hnsw:num_threads"}
+
+# Squared norms this close to 1 are treated as already normalized (float32 rounding)
+_UNIT_NORM_TOLERANCE = 1e-4
+
+# Vectors may be passed as Python lists or NumPy arrays
+Embedding = Union[List[float], np.ndarray]
+Embeddings = Union[List[List[float]], List[np.ndarray], np.ndarray]
+
+
+class QueryCoalescer:
+    """Collects concurrent single-vector queries and runs them as batched vector DB calls"""
+    
+    def __init__(self, service: "VectorDBService", max_batch_size: int, max_wait: float):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def submit(
+        self,
+        query_embedding: Embedding,
+        n_results: int,
+        filter_dict: Optional[Dict]
+    ) -> Dict[str, Any]:
+        """Queue a query and wait for its share of the batched result"""
+        if self._worker is None or self._worker.done():
+            # (Re)start the worker; queries already queued for a dead one are kept
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((query_embedding, n_results, filter_dict, future))
+        return await future
+    
+    def close(self):
+        """Stop the background worker"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+            self._queue = None
+    
+    async def _run(self):
+        """Drain the queue in batches of up to max_batch_size, waiting at most max_wait per batch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Queries that arrive while this batch runs are collected into the next one
+            try:
+                await self._dispatch(batch)
+            except Exception as e:
+                # Fail this batch's callers instead of leaving them waiting, and keep serving
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, int, Optional[Dict], asyncio.Future]]):
+        """Run one vector DB call per distinct filter and hand each caller its results"""
+        groups: Dict[str, list] = {}
+        for item in batch:
+            groups.setdefault(json.dumps(item[2], sort_keys=True), []).append(item)
+        
+        for items in groups.values():
+            # Fetch enough results for the largest request, then trim per caller
+            n_results = max(n for _, n, _, _ in items)
+            try:
+                results = await self.service.run_in_executor(
+                    self.service.query_batch,
+                    [embedding for embedding, _, _, _ in items],
+                    n_results=n_results,
+                    filter_dict=items[0][2],
+                )
+            except Exception as e:
+                for _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for i, (_, n, _, future) in enumerate(items):
+                if not future.done():
+                    future.set_result({
+                        key: [value[i][:n]] if value is not None else None
+                        for key, value in results.items()
+                    })
+
 
 class VectorDBService:
     """Service for managing vector database operations"""
@@ -19,34 +141,206 @@ class VectorDBService:
     def __init__(self):
         self.client = None
         self.collection = None
-        if CHROMADB_AVAILABLE:
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._coalescer = QueryCoalescer(
+            self,
+            max_batch_size=settings.QUERY_BATCH_SIZE,
+            max_wait=settings.QUERY_BATCH_WAIT_MS / 1000,
+        )
+        # Search results for recent query embeddings; cleared whenever the collection changes
+        self._query_cache = QueryCacheService(
+            max_size=settings.VECTOR_QUERY_CACHE_SIZE,
+            similarity_threshold=settings.VECTOR_QUERY_CACHE_SIMILARITY_THRESHOLD,
+        )
+        # Searches currently running, by exact cache key and cache generation, so identical queries share one
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        if settings.VECTOR_DB_BACKEND == "hnswlib" or CHROMADB_AVAILABLE:
             self._initialize()
     
     def _initialize(self):
-        """Initialize ChromaDB client and collection"""
-        if not CHROMADB_AVAILABLE:
+        """Initialize the configured vector index (ChromaDB collection or hnswlib)"""
+        if settings.VECTOR_DB_BACKEND == "hnswlib":
+            self.collection = HnswlibBackend(
+                persist_dir=settings.HNSWLIB_PERSIST_DIR,
+                max_elements=settings.HNSWLIB_MAX_ELEMENTS,
+                ef_construction=settings.CHROMA_HNSW_CONSTRUCTION_EF,
+                ef_search=settings.CHROMA_HNSW_SEARCH_EF,
+                M=settings.CHROMA_HNSW_M,
+                num_threads=settings.CHROMA_HNSW_NUM_THREADS,
+                indexed_metadata_keys=settings.INDEXED_METADATA_KEYS,
+                wal=settings.VECTOR_DB_SQLITE_WAL,
+                binary_codes=settings.VECTOR_QUERY_REFINE,
+                save_interval=settings.HNSWLIB_SAVE_INTERVAL,
+            )
+            self.warm_up()
             return
         
-        # Disable telemetry to suppress warnings
-        client_settings = Settings(
-            anonymized_telemetry=False,
-            allow_reset=True
-        )
+        if not CHROMADB_AVAILABLE:
+            return
         
-        self.client = chromadb.PersistentClient(
-            path=settings.CHROMA_PERSIST_DIR,
-            settings=client_settings
-        )
+        if settings.CHROMA_SERVER_HOST:
+            self.client = self._get_http_client(settings.CHROMA_SERVER_HOST, settings.CHROMA_SERVER_PORT)
+        else:
+            self.client = self._get_client(settings.CHROMA_PERSIST_DIR)
+        # Chroma copies these into the HNSW segment only when the collection is created;
+        # an existing collection keeps the parameters it was built with
+        hnsw_metadata = {
+            # Embeddings are unit-normalized, so inner product equals cosine similarity
+            # without computing norms on every distance
+            "hnsw:space": "ip",
+            "hnsw:construction_ef": settings.CHROMA_HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": settings.CHROMA_HNSW_SEARCH_EF,
+            "hnsw:M": settings.CHROMA_HNSW_M,
+            # Chroma has no capacity hint, so grow in large steps to make index copies rare
+            "hnsw:resize_factor": settings.CHROMA_HNSW_RESIZE_FACTOR,
+            # Parallelizes inserts; a single query vector is still searched by one thread
+            "hnsw:num_threads": settings.CHROMA_HNSW_NUM_THREADS,
+        }
         self.collection = self.client.get_or_create_collection(
             name=settings.CHROMA_COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
+            metadata=hnsw_metadata,
         )
+        if not settings.CHROMA_SERVER_HOST:
+            self._tune_sqlite(settings.CHROMA_PERSIST_DIR)
+            self._check_hnsw_params(settings.CHROMA_PERSIST_DIR, str(self.collection.id), hnsw_metadata)
+        self.warm_up()
+    
+    @staticmethod
+    def _get_client(persist_dir: str):
+        """Get the shared persistent client for a directory, creating it on first use"""
+        with _CLIENT_CACHE_LOCK:
+            client = _CLIENT_CACHE.get(persist_dir)
+            if client is None:
+                # Disable telemetry to suppress warnings
+                client_settings = Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
+                client = chromadb.PersistentClient(path=persist_dir, settings=client_settings)
+                _CLIENT_CACHE[persist_dir] = client
+            return client
+    
+    @staticmethod
+    def _get_http_client(host: str, port: int):
+        """
+        Get the shared client for a Chroma server, creating it on first use
+        
+        All workers talking to one server share a single copy of the index, and
+        the server applies every write, instead of each worker loading its own.
+        """
+        key = f"http://{host}:{port}"
+        with _CLIENT_CACHE_LOCK:
+            client = _CLIENT_CACHE.get(key)
+            if client is None:
+                client = chromadb.HttpClient(
+                    host=host,
+                    port=str(port),
+                    settings=Settings(anonymized_telemetry=False),
+                )
+                _CLIENT_CACHE[key] = client
+            return client
+    
+    @staticmethod
+    def _tune_sqlite(persist_dir: str):
+        """
+        Switch Chroma's database to WAL mode and optionally index its metadata by (key, value)
+        
+        Chroma 0.4.x has no API for metadata indexes and only indexes (id, key), so
+        filters like {"document_id": ...} read every metadata row. The table belongs to
+        Chroma's migrated schema, so the indexes are only added with CHROMA_METADATA_INDEXES
+        on a Chroma 0.4.x schema that has the expected columns, and are dropped otherwise.
+        The journal mode is stored in the database file, so Chroma's own connections pick it up.
+        """
+        db_path = os.path.join(persist_dir, "chroma.sqlite3")
+        if not os.path.exists(db_path):
+            return
+        
+        with sqlite3.connect(db_path) as db:
+            if settings.VECTOR_DB_SQLITE_WAL:
+                db.execute("PRAGMA journal_mode=WAL")
+            
+            columns = {row[1] for row in db.execute("PRAGMA table_info(embedding_metadata)")}
+            supported = chromadb.__version__.startswith("0.4.") and all(
+                column in columns for index_columns in _CHROMA_METADATA_INDEXES.values() for column in index_columns
+            )
+            if settings.CHROMA_METADATA_INDEXES and not supported:
+                logger.warning(
+                    "Not indexing ChromaDB metadata: unsupported Chroma version %s or schema",
+                    chromadb.__version__,
+                )
+            
+            for name, index_columns in _CHROMA_METADATA_INDEXES.items():
+                if settings.CHROMA_METADATA_INDEXES and supported:
+                    db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON embedding_metadata ({', '.join(index_columns)})")
+                else:
+                    # Leave Chroma's schema as Chroma created it, e.g. before an upgrade
+                    db.execute(f"DROP INDEX IF EXISTS {name}")
+        db.close()
+    
+    @staticmethod
+    def _check_hnsw_params(persist_dir: str, collection_id: str, configured: Dict[str, Any]):
+        """
+        Warn when the collection's HNSW index doesn't use the configured parameters
+        
+        Chroma reads HNSW parameters from the vector segment's metadata, which is written
+        once when the collection is created. get_or_create_collection() rewrites the
+        collection metadata but not the segment, so changed settings (the space included)
+        only apply after the collection is re-created. Thread counts are left out: they
+        don't change the stored graph, and the default follows the host's CPU count.
+        """
+        try:
+            # Private Chroma module; skip the check rather than fail if it moves
+            from chromadb.segment.impl.vector.hnsw_params import HnswParams
+        except ImportError:
+            return
+        
+        db_path = os.path.join(persist_dir, "chroma.sqlite3")
+        if not os.path.exists(db_path):
+            return
+        
+        with sqlite3.connect(db_path) as db:
+            rows = db.execute(
+                "SELECT m.key, m.str_value, m.int_value, m.float_value "
+                "FROM segment_metadata m JOIN segments s ON s.id = m.segment_id "
+                "WHERE s.collection = ? AND s.scope = 'VECTOR'",
+                (collection_id,),
+            ).fetchall()
+        db.close()
+        
+        segment_metadata = {
+            key: next((value for value in values if value is not None), None)
+            for key, *values in rows
+        }
+        # Parameters missing from the segment fall back to Chroma's defaults
+        effective = vars(HnswParams(segment_metadata))
+        mismatched = [
+            f"{key}={effective[key[len('hnsw:'):]]} (configured {value})"
+            for key, value in configured.items()
+            if key not in _HNSW_RUNTIME_KEYS and effective[key[len("hnsw:"):]] != value
+        ]
+        if mismatched:
+            logger.warning(
+                "ChromaDB collection %s was created with different HNSW parameters: %s. "
+                "They only apply to new collections; delete %s and re-upload documents to rebuild it.",
+                collection_id,
+                ", ".join(mismatched),
+                persist_dir,
+            )
+    
+    def warm_up(self):
+        """Load the HNSW index into memory so the first real query doesn't pay for it"""
+        if not self.collection or self.collection.count() == 0:
+            return
+        
+        # Query with a stored vector; the index is only loaded when it is searched
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        self.collection.query(query_embeddings=sample["embeddings"], n_results=1, include=[])
     
     def add_documents(
         self,
         document_id: str,
         chunk_ids: List[str],
-        embeddings: List[List[float]],
+        embeddings: Embeddings,
         chunks: List[str],
         metadatas: List[Dict[str, Any]]
     ):
@@ -56,23 +350,54 @@ class VectorDBService:
         Args:
             document_id: Document identifier
             chunk_ids: List of chunk IDs
-            embeddings: List of embedding vectors
+            embeddings: Embedding vectors, shape (len(chunk_ids), dim)
             chunks: List of chunk texts
             metadatas: List of metadata dictionaries
         """
+        self._add_to_collection(chunk_ids, embeddings, chunks, metadatas)
+        self._query_cache.clear()
+    
+    async def aadd_documents(
+        self,
+        document_id: str,
+        chunk_ids: List[str],
+        embeddings: Embeddings,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Add document chunks on the vector DB thread pool. Same arguments as add_documents()."""
+        await self.run_in_executor(self._add_to_collection, chunk_ids, embeddings, chunks, metadatas)
+        # Cleared on the event loop, where the cache is read
+        self._query_cache.clear()
+    
+    def _add_to_collection(
+        self,
+        chunk_ids: List[str],
+        embeddings: Embeddings,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Write chunks to the collection without touching the query cache"""
         if not self.collection:
             raise Exception("Vector database not initialized")
         
-        self.collection.add(
-            ids=chunk_ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas,
-        )
+        vectors = self._normalize(embeddings)
+        metadatas = self._optimize_metadata(metadatas)
+        batch_size = settings.CHROMA_ADD_BATCH_SIZE
+        
+        # Add in slices so only one slice is ever boxed into Python floats at a time
+        for start in range(0, len(chunk_ids), batch_size):
+            end = start + batch_size
+            self.collection.add(
+                ids=chunk_ids[start:end],
+                embeddings=self._to_backend(vectors[start:end]),
+                documents=chunks[start:end],
+                metadatas=metadatas[start:end],
+            )
     
     def query(
         self,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         n_results: int = 5,
         filter_dict: Optional[Dict] = None
     ) -> Dict[str, Any]:
@@ -83,22 +408,162 @@ class VectorDBService:
             query_embedding: Query embedding vector
             n_results: Number of results to return
             filter_dict: Optional filter dictionary
-            
+        
         Returns:
             Dictionary with ids, documents, metadatas, and distances
         """
+        query_vector, cache_key, cache_scope = self._cache_lookup_args(query_embedding, n_results, filter_dict)
+        cached = self._get_cached(query_vector, cache_key, cache_scope)
+        if cached is not None:
+            return cached
+        
+        # Adds and deletes clear the cache; results searched before one must not be stored after it
+        generation = self._query_cache.generation
+        results = self.query_batch([query_vector], n_results=n_results, filter_dict=filter_dict)
+        self._query_cache.put(cache_key, query_vector, cache_scope, results, generation=generation)
+        return results
+    
+    async def aquery(
+        self,
+        query_embedding: Embedding,
+        n_results: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Query vector database for similar chunks, batching with concurrent queries
+        
+        Queries arriving within QUERY_BATCH_WAIT_MS of each other are sent to the
+        vector database as one multi-vector call, and an identical query that is already
+        running is awaited instead of searched again. Same arguments and result shape as query().
+        """
+        if not self.collection:
+            raise Exception("Vector database not initialized")
+        
+        query_vector, cache_key, cache_scope = self._cache_lookup_args(query_embedding, n_results, filter_dict)
+        cached = self._get_cached(query_vector, cache_key, cache_scope)
+        if cached is not None:
+            return cached
+        
+        # Keyed by cache generation too, so queries after an add or delete don't join an older search
+        generation = self._query_cache.generation
+        inflight_key = (cache_key, generation)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._search_and_cache(query_vector, n_results, filter_dict, cache_key, cache_scope, generation)
+            )
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        
+        # Shielded so one caller disconnecting doesn't cancel the search for the others
+        return await asyncio.shield(task)
+    
+    async def _search_and_cache(
+        self,
+        query_vector: np.ndarray,
+        n_results: int,
+        filter_dict: Optional[Dict],
+        cache_key: Tuple,
+        cache_scope: Tuple,
+        generation: int
+    ) -> Dict[str, Any]:
+        """Run a batched search and cache its results unless the cache was cleared since `generation`"""
+        results = await self._coalescer.submit(query_vector, n_results, filter_dict)
+        self._query_cache.put(cache_key, query_vector, cache_scope, results, generation=generation)
+        return results
+    
+    def query_batch(
+        self,
+        query_embeddings: Embeddings,
+        n_results: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Query vector database for several embeddings in one call
+        
+        Args:
+            query_embeddings: Query embedding vectors
+            n_results: Number of results to return per query
+            filter_dict: Optional filter dictionary applied to every query
+        
+        Returns:
+            Dictionary with ids, documents, metadatas, and distances, one inner list per query
+        """
         if not self.collection:
             raise Exception("Vector database not initialized")
         
         where = filter_dict if filter_dict else None
         
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
+        include = ["documents", "metadatas", "distances"]
+        if settings.VECTOR_QUERY_REFINE and isinstance(self.collection, HnswlibBackend):
+            return self.collection.query_refined(
+                self._normalize(query_embeddings),
+                n_results=n_results,
+                where=where,
+                include=include,
+                overscan=settings.VECTOR_QUERY_OVERSCAN,
+            )
+        
+        # Listed explicitly so stored vectors are never serialized back
+        return self.collection.query(
+            query_embeddings=self._to_backend(self._normalize(query_embeddings)),
             n_results=n_results,
             where=where,
+            include=include,
         )
+    
+    def _cache_lookup_args(
+        self,
+        query_embedding: Embedding,
+        n_results: int,
+        filter_dict: Optional[Dict]
+    ) -> Tuple[np.ndarray, Tuple, Tuple]:
+        """Build the normalized query vector, exact cache key, and cache scope for a query"""
+        query_vector = self._normalize(query_embedding)[0]
+        # Results are only reusable for the same result count and filter
+        cache_scope = (n_results, json.dumps(filter_dict, sort_keys=True))
+        cache_key = (np.round(query_vector, 3).tobytes(), cache_scope)
+        return query_vector, cache_key, cache_scope
+    
+    def _get_cached(self, query_vector: np.ndarray, cache_key: Tuple, cache_scope: Tuple) -> Optional[Dict[str, Any]]:
+        """Look up cached results by exact (rounded) vector, then by similarity"""
+        cached = self._query_cache.get(cache_key)
+        if cached is None:
+            cached = self._query_cache.get_similar(query_vector, cache_scope)
+        return cached
+    
+    async def resize_index(self, new_capacity: int):
+        """
+        Grow the hnswlib index to hold new_capacity vectors, on the vector DB thread pool
         
-        return results
+        Queries wait while the index is copied, so call this ahead of large imports.
+        
+        Args:
+            new_capacity: Number of vectors the index can hold
+        """
+        if not isinstance(self.collection, HnswlibBackend):
+            raise Exception("Index resizing is only supported by the hnswlib backend")
+        
+        await self.run_in_executor(self.collection.resize_index, new_capacity)
+    
+    async def run_in_executor(self, func, *args, **kwargs):
+        """Run a blocking vector DB call on the dedicated thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.VECTOR_DB_MAX_WORKERS,
+                thread_name_prefix="vector-db",
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+    
+    def close(self):
+        """Stop background query batching and the vector DB thread pool, and save the hnswlib index"""
+        self._coalescer.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if isinstance(self.collection, HnswlibBackend):
+            self.collection.close()
     
     def get_chunks(self, chunk_ids: List[str]) -> Dict[str, Any]:
         """
@@ -106,32 +571,136 @@ class VectorDBService:
         
         Args:
             chunk_ids: List of chunk IDs
-            
+        
         Returns:
-            Dictionary with ids and documents
+            Dictionary with ids, documents, and metadatas
         """
         if not self.collection:
             raise Exception("Vector database not initialized")
         
-        return self.collection.get(ids=chunk_ids)
+        return self.collection.get(ids=chunk_ids, include=["documents", "metadatas"])
     
-    def delete_document(self, document_id: str):
+    def get_chunks_by_document(self, document_id: str) -> Dict[str, Any]:
         """
-        Delete all chunks for a document
+        Get all chunks for a document, ordered by chunk index
         
         Args:
             document_id: Document identifier
+        
+        Returns:
+            Dictionary with ids, documents, and metadatas
         """
         if not self.collection:
             raise Exception("Vector database not initialized")
         
-        # Get all chunks for this document
         results = self.collection.get(
-            where={"document_id": document_id}
+            where={"document_id": document_id},
+            include=["documents", "metadatas"],
+        )
+        
+        order = sorted(
+            range(len(results["ids"])),
+            key=lambda i: results["metadatas"][i]["chunk_index"]
         )
         
-        if results["ids"]:
-            self.collection.delete(ids=results["ids"])
+        return {
+            "ids": [results["ids"][i] for i in order],
+            "documents": [results["documents"][i] for i in order],
+            "metadatas": [results["metadatas"][i] for i in order],
+        }
+    
+    async def aget_chunks_by_document(self, document_id: str) -> Dict[str, Any]:
+        """Get all chunks for a document on the vector DB thread pool. Same result as get_chunks_by_document()."""
+        return await self.run_in_executor(self.get_chunks_by_document, document_id)
+    
+    @staticmethod
+    def _optimize_metadata(metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Flatten chunk metadata into the scalar values Chroma stores
+        
+        List values become comma-joined strings (read back with _parse_tags_fast),
+        nested dicts become dotted keys, and None values are dropped. Dicts that
+        are already flat are passed through without being copied.
+        """
+        scalar_types = (str, int, float, bool)
+        optimized = []
+        for metadata in metadatas:
+            if all(isinstance(value, scalar_types) for value in metadata.values()):
+                optimized.append(metadata)
+                continue
+            
+            flat: Dict[str, Any] = {}
+            pending = list(metadata.items())
+            while pending:
+                key, value = pending.pop()
+                if value is None:
+                    continue
+                if isinstance(value, dict):
+                    pending.extend((f"{key}.{k}", v) for k, v in value.items())
+                elif isinstance(value, (list, tuple, set)):
+                    flat[key] = ",".join(str(item) for item in value)
+                else:
+                    flat[key] = value
+            optimized.append(flat)
+        return optimized
+    
+    @staticmethod
+    def _parse_tags_fast(value: str) -> List[str]:
+        """Split a comma-joined metadata value back into its items"""
+        return value.split(",") if value else []
+    
+    def _to_backend(self, vectors: np.ndarray):
+        """Pass vectors as an array to hnswlib; Chroma 0.4.x only accepts nested lists"""
+        if isinstance(self.collection, HnswlibBackend):
+            return vectors
+        return vectors.tolist()
+    
+    @staticmethod
+    def _as_float32_rows(embeddings: Union[Embedding, Embeddings]) -> np.ndarray:
+        """View embeddings as a C-contiguous 2-D float32 array, copying only if needed"""
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        return vectors.reshape(1, -1) if vectors.ndim == 1 else vectors
+    
+    @staticmethod
+    def _normalize(embeddings: Union[Embedding, Embeddings]) -> np.ndarray:
+        """
+        Return embeddings as a 2-D float32 array of unit-length rows
+        
+        Embeddings from the embedding service are already unit length, so rows are only
+        divided (into a new array; the input may be the caller's) when some norm is off.
+        """
+        vectors = VectorDBService._as_float32_rows(embeddings)
+        # Squared norms of all rows in one pass, without a temporary of squares
+        squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+        if np.all(np.abs(squared_norms - 1.0) < _UNIT_NORM_TOLERANCE):
+            return vectors
+        
+        norms = np.sqrt(squared_norms)[:, np.newaxis]
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def delete_document(self, document_id: str):
+        """
+        Delete all chunks for a document
+        
+        Args:
+            document_id: Document identifier
+        """
+        self._delete_from_collection(document_id)
+        self._query_cache.clear()
+    
+    async def adelete_document(self, document_id: str):
+        """Delete all chunks for a document on the vector DB thread pool"""
+        await self.run_in_executor(self._delete_from_collection, document_id)
+        self._query_cache.clear()
+    
+    def _delete_from_collection(self, document_id: str):
+        """Delete a document's chunks without touching the query cache"""
+        if not self.collection:
+            raise Exception("Vector database not initialized")
+        
+        # Chroma resolves the filter itself, so no ids or chunk texts are fetched first
+        self.collection.delete(where={"document_id": document_id})
 
 
 # Global instance
@@ -0,0 +1,21 @@
+"""
+Test package
+
+Importing app.services builds the module-level vector DB service, so point every
+on-disk store at a temporary directory before any test imports the app.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+atexit.register(shutil.rmtree, _DATA_DIR, ignore_errors=True)
+
+os.environ["VECTOR_DB_BACKEND"] = "chroma"
+os.environ["CHROMA_SERVER_HOST"] = ""
+os.environ["CHROMA_PERSIST_DIR"] = os.path.join(_DATA_DIR, "chroma_db")
+os.environ["HNSWLIB_PERSIST_DIR"] = os.path.join(_DATA_DIR, "hnswlib_db")
+os.environ["STORAGE_PATH"] = os.path.join(_DATA_DIR, "documents")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
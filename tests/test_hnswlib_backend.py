@@ -0,0 +1,133 @@
+"""
+Tests for the hnswlib vector backend
+"""
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from app.services.hnswlib_backend import HnswlibBackend, HNSWLIB_AVAILABLE
+
+
+@unittest.skipUnless(HNSWLIB_AVAILABLE, "hnswlib is not installed")
+class HnswlibBackendTest(unittest.TestCase):
+    """Label bookkeeping across adds and deletes"""
+    
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100)
+        self.rng = np.random.default_rng(0)
+    
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+    
+    def _add(self, backend: HnswlibBackend, document_id: str, n: int = 3):
+        vectors = self.rng.normal(size=(n, 8)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        backend.add(
+            ids=[f"{document_id}_chunk_{i}" for i in range(n)],
+            embeddings=vectors,
+            documents=[f"{document_id} text {i}" for i in range(n)],
+            metadatas=[{"document_id": document_id, "chunk_index": i} for i in range(n)],
+        )
+        return vectors
+    
+    def test_delete_newest_then_add_then_delete(self):
+        """Labels freed by deleting the newest document are never reused"""
+        self._add(self.backend, "A")
+        self._add(self.backend, "B")
+        self.backend.delete(where={"document_id": "B"})
+        vectors_c = self._add(self.backend, "C")
+        self._add(self.backend, "D")
+        
+        self.backend.delete(where={"document_id": "C"})
+        
+        self.assertEqual(self.backend.get(where={"document_id": "C"})["ids"], [])
+        self.assertEqual(self.backend.count(), 6)
+        result = self.backend.query(vectors_c[:1], n_results=6)
+        self.assertTrue(all(not chunk_id.startswith("C_") for chunk_id in result["ids"][0]))
+    
+    def test_overwritten_chunk_leaves_no_stale_vector(self):
+        """Re-adding a chunk id retires its old vector even when freed slots exist"""
+        vectors_a = self._add(self.backend, "A")
+        self._add(self.backend, "B")
+        self._add(self.backend, "C")
+        self.backend.delete(where={"document_id": "B"})
+        
+        new_vector = -vectors_a[:1]
+        self.backend.add(
+            ids=["A_chunk_0"],
+            embeddings=new_vector,
+            documents=["A text 0"],
+            metadatas=[{"document_id": "A", "chunk_index": 0}],
+        )
+        
+        result = self.backend.query(vectors_a[:1], n_results=6)
+        self.assertEqual(len(result["ids"][0]), 6)
+        best = dict(zip(result["ids"][0], result["distances"][0]))
+        self.assertAlmostEqual(best["A_chunk_0"], 2.0, places=4)
+        
+        self.backend.delete(where={"document_id": "A"})
+        result = self.backend.query(vectors_a[:1], n_results=3)
+        self.assertEqual(sorted(result["ids"][0]), ["C_chunk_0", "C_chunk_1", "C_chunk_2"])
+    
+    def test_exact_search_skips_deleted_labels(self):
+        """The brute-force fallback only searches stored chunks"""
+        vectors_a = self._add(self.backend, "A")
+        self._add(self.backend, "B")
+        self.backend.delete(where={"document_id": "A"})
+        
+        labels, _ = self.backend._exact_query(vectors_a[:1], 3, None)
+        result = self.backend._query_result(labels, np.zeros(labels.shape), ["documents"])
+        self.assertEqual(sorted(result["ids"][0]), ["B_chunk_0", "B_chunk_1", "B_chunk_2"])
+    
+    def test_labels_stay_unique_after_restart(self):
+        """The label counter survives reopening the index"""
+        self._add(self.backend, "A")
+        self._add(self.backend, "B")
+        self.backend.delete(where={"document_id": "B"})
+        self.backend.close()
+        
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100)
+        vectors_c = self._add(self.backend, "C")
+        self.backend.delete(where={"document_id": "C"})
+        
+        self.assertEqual(self.backend.count(), 3)
+        result = self.backend.query(vectors_c[:1], n_results=3)
+        self.assertEqual(sorted(result["ids"][0]), ["A_chunk_0", "A_chunk_1", "A_chunk_2"])
+    
+    def test_binary_codes_rebuilt_after_writes_without_them(self):
+        """Codes saved before writes made with binary codes off are not reused"""
+        self.backend.close()
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100, binary_codes=True)
+        self._add(self.backend, "A")
+        self.backend.close()
+        
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100)
+        vectors_b = self._add(self.backend, "B")
+        self.backend.delete(where={"document_id": "A"})
+        self.backend.close()
+        
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100, binary_codes=True)
+        result = self.backend.query_refined(vectors_b[:1], n_results=3)
+        self.assertEqual(sorted(result["ids"][0]), ["B_chunk_0", "B_chunk_1", "B_chunk_2"])
+    
+    def test_unsaved_writes_are_reconciled_on_restart(self):
+        """Rows and index agree after a shutdown that skipped the pending save"""
+        self._add(self.backend, "A")
+        self.backend.flush()
+        self._add(self.backend, "B")
+        self.backend.delete(where={"document_id": "A"})
+        # Simulate a crash: the scheduled save never runs
+        self.backend._save_timer.cancel()
+        self.backend._db.close()
+        
+        self.backend = HnswlibBackend(self.persist_dir, max_elements=100)
+        
+        self.assertEqual(self.backend.count(), 0)
+        self.assertEqual(self.backend.query(self.rng.normal(size=(1, 8)), n_results=3)["ids"], [[]])
+
+
+if __name__ == "__main__":
+    unittest.main()
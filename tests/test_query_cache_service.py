@@ -0,0 +1,89 @@
+"""
+Tests for the exact and similarity query cache
+"""
+
+import unittest
+import numpy as np
+from app.services.query_cache_service import QueryCacheService
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class QueryCacheServiceTest(unittest.TestCase):
+    """Lookups, eviction, and invalidation"""
+    
+    def setUp(self):
+        self.cache = QueryCacheService(max_size=2, similarity_threshold=0.97)
+    
+    def test_exact_hit(self):
+        """A stored key is returned as-is; unknown keys miss"""
+        self.cache.put(("what is rag", 5), unit(1, 0, 0), scope=5, value="answer")
+        
+        self.assertEqual(self.cache.get(("what is rag", 5)), "answer")
+        self.assertIsNone(self.cache.get(("what is rag", 3)))
+    
+    def test_similar_hit_above_threshold(self):
+        """A nearby embedding in the same scope reuses the cached result"""
+        self.cache.put("q", unit(1, 0, 0), scope=5, value="answer")
+        
+        self.assertEqual(self.cache.get_similar(unit(1, 0.1, 0), scope=5), "answer")
+        self.assertIsNone(self.cache.get_similar(unit(1, 0.1, 0), scope=3))
+    
+    def test_similar_miss_below_threshold(self):
+        """A distant embedding misses even in the same scope"""
+        self.cache.put("q", unit(1, 0, 0), scope=5, value="answer")
+        
+        self.assertIsNone(self.cache.get_similar(unit(1, 0.5, 0), scope=5))
+    
+    def test_unnormalized_embeddings_match(self):
+        """Embeddings are compared by direction, whatever their length"""
+        self.cache.put("q", [3.0, 0.0, 0.0], scope=5, value="answer")
+        
+        self.assertEqual(self.cache.get_similar([0.5, 0.0, 0.0], scope=5), "answer")
+    
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted when full"""
+        self.cache.put("a", unit(1, 0, 0), scope=5, value="A")
+        self.cache.put("b", unit(0, 1, 0), scope=5, value="B")
+        self.cache.get("a")
+        self.cache.put("c", unit(0, 0, 1), scope=5, value="C")
+        
+        self.assertEqual(self.cache.get("a"), "A")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNone(self.cache.get_similar(unit(0, 1, 0), scope=5))
+        self.assertEqual(self.cache.get("c"), "C")
+    
+    def test_put_from_before_clear_is_dropped(self):
+        """Results computed before a clear() are not stored after it"""
+        generation = self.cache.generation
+        self.cache.clear()
+        self.cache.put("q", unit(1, 0, 0), scope=5, value="stale", generation=generation)
+        
+        self.assertIsNone(self.cache.get("q"))
+        
+        self.cache.put("q", unit(1, 0, 0), scope=5, value="fresh", generation=self.cache.generation)
+        self.assertEqual(self.cache.get("q"), "fresh")
+    
+    def test_dimension_change_clears(self):
+        """Storing an embedding of a new dimension drops entries of the old one"""
+        self.cache.put("a", unit(1, 0, 0), scope=5, value="A")
+        self.cache.put("b", unit(1, 0, 0, 0), scope=5, value="B")
+        
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get_similar(unit(1, 0, 0), scope=5))
+        self.assertEqual(self.cache.get_similar(unit(1, 0, 0, 0), scope=5), "B")
+    
+    def test_disabled_cache_stores_nothing(self):
+        """max_size=0 turns the cache off"""
+        cache = QueryCacheService(max_size=0, similarity_threshold=0.97)
+        cache.put("q", unit(1, 0, 0), scope=5, value="answer")
+        
+        self.assertIsNone(cache.get("q"))
+        self.assertIsNone(cache.get_similar(unit(1, 0, 0), scope=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
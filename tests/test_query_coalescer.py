@@ -0,0 +1,107 @@
+"""
+Tests for batching concurrent vector DB queries
+"""
+
+import asyncio
+import unittest
+from app.services.vector_db_service import QueryCoalescer
+
+
+class FakeVectorDBService:
+    """Records query_batch calls and returns ids derived from each query vector"""
+    
+    def __init__(self):
+        self.calls = []
+        self.error = None
+    
+    async def run_in_executor(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+    
+    def query_batch(self, query_embeddings, n_results, filter_dict=None):
+        self.calls.append((len(query_embeddings), n_results, filter_dict))
+        if self.error:
+            raise self.error
+        return {
+            "ids": [[f"{int(e[0])}_{i}" for i in range(n_results)] for e in query_embeddings],
+            "distances": [[float(i) for i in range(n_results)] for _ in query_embeddings],
+            "embeddings": None,
+        }
+
+
+class QueryCoalescerTest(unittest.IsolatedAsyncioTestCase):
+    """Batching, per-caller trimming, and error handling"""
+    
+    def setUp(self):
+        self.service = FakeVectorDBService()
+        self.coalescer = QueryCoalescer(self.service, max_batch_size=8, max_wait=0.01)
+    
+    def tearDown(self):
+        self.coalescer.close()
+    
+    async def test_batches_per_filter(self):
+        """Concurrent queries share one call per distinct filter"""
+        results = await asyncio.gather(
+            self.coalescer.submit([1.0], 2, None),
+            self.coalescer.submit([2.0], 2, {"document_id": "a"}),
+            self.coalescer.submit([3.0], 2, None),
+            self.coalescer.submit([4.0], 2, {"document_id": "a"}),
+        )
+        
+        self.assertEqual(
+            sorted(self.service.calls, key=str),
+            sorted([(2, 2, None), (2, 2, {"document_id": "a"})], key=str),
+        )
+        self.assertEqual(
+            [result["ids"] for result in results],
+            [[["1_0", "1_1"]], [["2_0", "2_1"]], [["3_0", "3_1"]], [["4_0", "4_1"]]],
+        )
+    
+    async def test_trims_to_each_callers_n(self):
+        """The batch fetches the largest n and each caller gets its own n"""
+        small, large = await asyncio.gather(
+            self.coalescer.submit([1.0], 2, None),
+            self.coalescer.submit([2.0], 5, None),
+        )
+        
+        self.assertEqual(self.service.calls, [(2, 5, None)])
+        self.assertEqual(small["ids"], [["1_0", "1_1"]])
+        self.assertEqual(large["distances"], [[0.0, 1.0, 2.0, 3.0, 4.0]])
+        self.assertIsNone(small["embeddings"])
+    
+    async def test_query_errors_reach_every_caller(self):
+        """A failed batch call raises in each of its callers"""
+        self.service.error = RuntimeError("index unavailable")
+        
+        results = await asyncio.gather(
+            self.coalescer.submit([1.0], 2, None),
+            self.coalescer.submit([2.0], 2, None),
+            return_exceptions=True,
+        )
+        
+        self.assertEqual([str(result) for result in results], ["index unavailable"] * 2)
+    
+    async def test_worker_survives_dispatch_errors(self):
+        """An error outside the query call fails its batch but not later queries"""
+        # Not assertRaises: it clears the traceback's frames, which include the worker's own
+        (error,) = await asyncio.gather(
+            asyncio.wait_for(self.coalescer.submit([1.0], 2, {"document_id": object()}), timeout=1),
+            return_exceptions=True,
+        )
+        self.assertIsInstance(error, TypeError)
+        
+        result = await asyncio.wait_for(self.coalescer.submit([2.0], 1, None), timeout=1)
+        self.assertEqual(result["ids"], [["2_0"]])
+    
+    async def test_restarts_a_stopped_worker(self):
+        """Queries are still served after the worker task has ended"""
+        await self.coalescer.submit([1.0], 1, None)
+        worker = self.coalescer._worker
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        
+        result = await asyncio.wait_for(self.coalescer.submit([2.0], 1, None), timeout=1)
+        self.assertEqual(result["ids"], [["2_0"]])
+
+
+if __name__ == "__main__":
+    unittest.main()